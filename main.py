@@ -1,67 +1,229 @@
-from src.backtesting import *
-from src.data import *
-from src.strategy import *
-import yaml
+"""Command line interface for fetching data, backtesting strategies and showing signals.
+
+Each subcommand imports only the modules it needs and the config is read from `--config`
+only when a subcommand needs it, so cheap queries (e.g. `signals --cache-only`) start fast.
+"""
+import argparse
+import sys
 from typing import Callable, Any
-import pandas as pd
-
-with open("./config/config.yaml", 'r') as f:
-    config = yaml.load(f, Loader=yaml.FullLoader)
-    
-def run_strategy(strategy_name: str = None, 
-                 strategy_function: Callable = None, 
-                 df: pd.DataFrame = None, 
-                 obj_backtesting: Any = None, 
-                 strategies: list = None) -> None:
-    
+
+DEFAULT_CACHE_DIR = "./cache"
+
+def load_settings(args: argparse.Namespace, require_ticker: bool = True) -> dict:
+    """Returns the config, with TICKER/START_DATE/END_DATE/INTERVAL overridden by the command line."""
+    from src.config import load_config
+
+    try:
+        config = dict(load_config(args.config))
+    except FileNotFoundError:
+        if args.config is not None:
+            raise
+        config = {}
+
+    for key, value in (("TICKER", args.ticker), ("START_DATE", args.start), ("END_DATE", args.end), ("INTERVAL", args.interval)):
+        if value is not None:
+            config[key] = value
+    config.setdefault("INTERVAL", "1d")
+    config.setdefault("STRATEGIES", [(3, 5), (5, 10)])
+
+    if require_ticker and config.get("TICKER") is None:
+        sys.exit("No ticker given: pass --ticker or set TICKER in the config")
+    return config
+
+def get_ticker_data(args: argparse.Namespace, config: dict, ticker: str = None):
+    from src.data import TickerData
+
+    return TickerData(ticker or config.get("TICKER"), config.get("START_DATE"), config.get("END_DATE"), config.get("INTERVAL"), args.cache_dir)
+
+def run_strategy(strategy_name: str = None,
+                 strategy_function: Callable = None,
+                 df: Any = None,
+                 obj_backtesting: Any = None,
+                 strategies: list = None,
+                 ticker: str = None,
+                 checkpoint_dir: str = None,
+                 interval: str = None) -> None:
+
     # Test the strategy with multiple configurations
-    strat_result = obj_backtesting.test_strategy(strategy_function, df, strategies, verbose=0)
+    strat_result = obj_backtesting.test_strategy(strategy_function, df, strategies, verbose=0, sparse=True, ticker=ticker, checkpoint_dir=checkpoint_dir, interval=interval)
     print(f"Best {strategy_name}: S${strat_result.get('fund')} ({strat_result.get('best')})")
-    
+
     # Show the signals
-    signals = obj_backtesting.show_signals(strategy_function(df), latest=True)
+    signals = obj_backtesting.show_signals(strategy_function(df, sparse=True), latest=True)
     print(f"Signals for {strategy_name} strategy: {signals}\n")
 
-if __name__ == "__main__":
-    starting_fund = config.get("FUND")
-    ticker = config.get("TICKER")
-    start_date = config.get("START_DATE")
-    end_date = config.get("END_DATE")
-    interval = config.get("INTERVAL")
-    strategies = config.get("STRATEGIES")
-    
-    # Initialize objects
-    obj_ticker_data = TickerData(ticker, start_date, end_date, interval)
-    obj_backtesting = Backtesting(starting_fund)
-    obj_sma = SimpleMovingAverage()
-    obj_ema = ExponentialMovingAverage()
-    obj_macd = MovingAverageConvergenceDivergence()
-    obj_rsi = RelativeStrengthIndex()
-    obj_msi = MoneyFlowIndex()
-    obj_so = StochasticOscillator()
-    obj_roc = RateOfChange()
-    
-    # Get data
-    df = obj_ticker_data.get_data()
-    
-    # Perform Strategies
-    run_strategy("SMA", obj_sma.sma, df, obj_backtesting, strategies)
-    run_strategy("EMA", obj_ema.ema, df, obj_backtesting, strategies)
-    run_strategy("MACD", obj_macd.macd, df, obj_backtesting, strategies)
-    
+def show_oscillators(df: Any, obj_backtesting: Any) -> None:
+    from src.strategy import RelativeStrengthIndex, MoneyFlowIndex, StochasticOscillator, RateOfChange
+
     # Run RSI
-    rsi_signal = obj_backtesting.show_signals(obj_rsi.rsi(df), is_oscillator = True, latest=True)
+    rsi_signal = obj_backtesting.show_signals(RelativeStrengthIndex().rsi(df), is_oscillator = True, latest=True)
     print(f"RSI Signal {rsi_signal[0].title()} between {rsi_signal[1]} and {rsi_signal[2]}")
-    
+
     # Run MSI
-    msi_signal = obj_backtesting.show_signals(obj_msi.msi(df), is_oscillator = True, latest=True)
+    msi_signal = obj_backtesting.show_signals(MoneyFlowIndex().msi(df), is_oscillator = True, latest=True)
     print(f"MSI Signal {msi_signal[0].title()} between {msi_signal[1]} and {msi_signal[2]}")
-    
+
     # Run SO
-    so_signal = obj_backtesting.show_signals(obj_so.so(df), is_oscillator = True, latest=True)
+    so_signal = obj_backtesting.show_signals(StochasticOscillator().so(df), is_oscillator = True, latest=True)
     print(f"SO Signal {so_signal[0].title()} between {so_signal[1]} and {so_signal[2]}")
-    
+
     # Run ROC
-    roc_signal = obj_roc.roc(df)
+    roc_signal = RateOfChange().roc(df)
     last_price_trend = roc_signal.movement.to_list()[-1]
-    print(f"ROC Latest Trend: {last_price_trend.title()}")
\ No newline at end of file
+    print(f"ROC Latest Trend: {last_price_trend.title()}")
+
+def fetch(args: argparse.Namespace) -> None:
+    """Fetches the ticker data, replacing any cached copy."""
+    config = load_settings(args)
+    obj_ticker_data = get_ticker_data(args, config)
+    df = obj_ticker_data.get_data()
+    print(f"Cached {len(df)} rows of {obj_ticker_data.ticker} ({obj_ticker_data.interval}) at {obj_ticker_data.cache_path}")
+
+def backtest(args: argparse.Namespace) -> None:
+    """Backtests the crossover strategies and shows the latest signals of every strategy."""
+    from src.backtesting import Backtesting
+    from src.strategy import SimpleMovingAverage, ExponentialMovingAverage, MovingAverageConvergenceDivergence
+
+    config = load_settings(args)
+    obj_backtesting = Backtesting(config.get("FUND", 10_000), config.get("PATTERN"))
+    strategies = config.get("STRATEGIES")
+
+    # Get data
+    df = get_ticker_data(args, config).get_data(cache_only=args.cache_only)
+
+    # Perform Strategies
+    ticker = config.get("TICKER")
+    run_strategy("SMA", SimpleMovingAverage().sma, df, obj_backtesting, strategies, ticker, args.checkpoint_dir, config.get("INTERVAL"))
+    run_strategy("EMA", ExponentialMovingAverage().ema, df, obj_backtesting, strategies, ticker, args.checkpoint_dir, config.get("INTERVAL"))
+    run_strategy("MACD", MovingAverageConvergenceDivergence().macd, df, obj_backtesting, strategies, ticker, args.checkpoint_dir, config.get("INTERVAL"))
+
+    # Sweep the windows over the cost assumptions
+    if config.get("COSTS"):
+        from src.backtesting import CostModel
+
+        costs = [CostModel.from_config(cost) for cost in config.get("COSTS")]
+        for strategy_name, strategy_function in (("SMA", SimpleMovingAverage().sma),
+                                                 ("EMA", ExponentialMovingAverage().ema),
+                                                 ("MACD", MovingAverageConvergenceDivergence().macd)):
+            print(f"\n{strategy_name} final fund by window and costs:")
+            print(obj_backtesting.sweep(strategy_function, df, strategies, costs).to_string())
+
+    show_oscillators(df, obj_backtesting)
+
+def signals(args: argparse.Namespace) -> None:
+    """Shows the latest signals of every strategy with its default parameters."""
+    from src.backtesting import Backtesting
+    from src.strategy import SimpleMovingAverage, ExponentialMovingAverage, MovingAverageConvergenceDivergence
+
+    config = load_settings(args)
+    obj_backtesting = Backtesting(config.get("FUND", 10_000), config.get("PATTERN"))
+    df = get_ticker_data(args, config).get_data(cache_only=args.cache_only)
+
+    for strategy_name, strategy_function in (("SMA", SimpleMovingAverage().sma),
+                                             ("EMA", ExponentialMovingAverage().ema),
+                                             ("MACD", MovingAverageConvergenceDivergence().macd)):
+        signal = obj_backtesting.show_signals(strategy_function(df, sparse=True), latest=True)
+        print(f"Signals for {strategy_name} strategy: {signal}")
+
+    show_oscillators(df, obj_backtesting)
+
+def screen(args: argparse.Namespace) -> None:
+    """Shows the latest oscillator signals of several tickers, or ranks them with --top."""
+    config = load_settings(args, require_ticker=not args.tickers)
+    if args.top is not None:
+        return rank_universe(args, config)
+
+    from src.backtesting import Backtesting
+
+    obj_backtesting = Backtesting(config.get("FUND", 10_000), config.get("PATTERN"))
+
+    for ticker in args.tickers or [config.get("TICKER")]:
+        print(f"{ticker}:")
+        show_oscillators(get_ticker_data(args, config, ticker).get_data(cache_only=args.cache_only), obj_backtesting)
+        print()
+
+def rank_universe(args: argparse.Namespace, config: dict) -> None:
+    """Ranks the tickers by ROC or RSI on the latest bar and shows the top and bottom ones."""
+    import pandas as pd
+    from src.universe import Universe
+
+    universe = Universe.from_tickers(args.tickers or [config.get("TICKER")], config.get("START_DATE"), config.get("END_DATE"),
+                                     config.get("INTERVAL"), args.cache_dir, args.cache_only, args.fill_limit)
+    scores = universe.roc() if args.by == "roc" else universe.rsi()
+
+    latest = scores.iloc[-1]
+    table = {args.by.upper(): latest,
+             "Rank": universe.rank(scores).iloc[-1],
+             "Top": universe.top_k(scores, args.top).iloc[-1],
+             "Bottom": universe.bottom_k(scores, args.top).iloc[-1]}
+    print(f"Ranking by {args.by.upper()} on {scores.index[-1]}:")
+    print(pd.DataFrame(table).sort_values("Rank").to_string())
+
+def batch(args: argparse.Namespace) -> None:
+    """Runs the jobs of a batch file and writes all results to one CSV."""
+    from src.batch import run_batch
+
+    print(run_batch(args.jobs, args.output, args.cache_dir))
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Backtest trading strategies on Yahoo Finance data.")
+    parser.add_argument("--config", help="path of the YAML config (default is ./config/config.yaml if it exists)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help=f"directory of the fetched data cache (default is {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--instrument", metavar="PREFIX", help="time each stage and write PREFIX.json and PREFIX.trace.json")
+    parser.add_argument("--profile", metavar="PATH", help="run under cProfile and write the stats to PATH")
+    parser.add_argument("--trace-memory", action="store_true", help="run under tracemalloc and print the top allocation sites")
+    parser.set_defaults(command=backtest, ticker=None, start=None, end=None, interval=None, cache_only=False, checkpoint_dir=None)
+
+    # Options shared by the subcommands that read ticker data
+    data_parser = argparse.ArgumentParser(add_help=False)
+    data_parser.add_argument("--ticker", help="ticker symbol (default is TICKER in the config)")
+    data_parser.add_argument("--start", help="start date in YYYY-MM-DD format (default is START_DATE in the config)")
+    data_parser.add_argument("--end", help="end date in YYYY-MM-DD format (default is END_DATE in the config)")
+    data_parser.add_argument("--interval", help="data interval, e.g. 1d or 1wk (default is INTERVAL in the config)")
+    data_parser.add_argument("--cache-only", action="store_true", help="only read cached data and never fetch")
+
+    subparsers = parser.add_subparsers(title="commands")
+    subparsers.add_parser("fetch", parents=[data_parser], help="fetch ticker data into the cache").set_defaults(command=fetch)
+    backtest_parser = subparsers.add_parser("backtest", parents=[data_parser], help="backtest the strategies (default)")
+    backtest_parser.add_argument("--checkpoint-dir", help="resume each backtest from its checkpoint in this directory and update it")
+    backtest_parser.set_defaults(command=backtest)
+    subparsers.add_parser("signals", parents=[data_parser], help="show the latest signals").set_defaults(command=signals)
+
+    screen_parser = subparsers.add_parser("screen", parents=[data_parser], help="show the latest oscillator signals of several tickers")
+    screen_parser.add_argument("tickers", nargs="*", help="ticker symbols (default is --ticker)")
+    screen_parser.add_argument("--top", type=int, metavar="K", help="rank the tickers on the latest bar and flag the top and bottom K")
+    screen_parser.add_argument("--by", choices=["roc", "rsi"], default="roc", help="indicator to rank by (default is roc)")
+    screen_parser.add_argument("--fill-limit", type=int, help="forward-fill at most this many missing bars per ticker")
+    screen_parser.set_defaults(command=screen)
+
+    batch_parser = subparsers.add_parser("batch", help="run the JOBS of a YAML file and write all results to one CSV")
+    batch_parser.add_argument("jobs", help="path of the YAML file listing the JOBS")
+    batch_parser.add_argument("output", help="path of the output CSV")
+    batch_parser.set_defaults(command=batch)
+    return parser
+
+def main(argv: list = None) -> None:
+    args = build_parser().parse_args(argv)
+
+    if args.instrument:
+        from src.instrument import instrument
+
+        instrument.enable()
+
+    try:
+        if args.profile or args.trace_memory:
+            from src.instrument import capture
+
+            with capture(args.profile, args.trace_memory):
+                args.command(args)
+        else:
+            args.command(args)
+    except FileNotFoundError as e:
+        sys.exit(str(e))
+
+    if args.instrument:
+        instrument.export_json(f"{args.instrument}.json")
+        instrument.export_trace(f"{args.instrument}.trace.json")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,51 @@
+import hashlib
+import inspect
+import json
+import os
+import numpy as np
 import pandas as pd
 from typing import Callable, List, Dict, Tuple
-import yaml
+from src.config import load_config
+from src.instrument import instrument
+from src.strategy import SignalEvents
 
-with open("./config/config.yaml", 'r') as f:
-    config = yaml.load(f, Loader=yaml.FullLoader)
+DEFAULT_PATTERN = "%Y-%m-%d"
+
+class CostModel:
+    """Transaction cost, slippage and lot-size assumptions for a backtest.
+
+    Each fill pays `fixed_fee` plus `fee_bps` basis points of its notional, and is executed
+    `slippage_bps` basis points worse than the signal price (above it when buying, below it
+    when selling). Shares are bought in whole multiples of `lot_size`.
+
+    Attributes
+    ----------
+    fixed_fee : float
+        The fixed fee charged per fill (default is 0).
+    fee_bps : float
+        The fee charged per fill in basis points of the notional (default is 0).
+    slippage_bps : float
+        The slippage per fill in basis points of the price (default is 0).
+    lot_size : int
+        The number of shares per lot (default is 1).
+    """
+
+    def __init__(self, fixed_fee: float = 0, fee_bps: float = 0, slippage_bps: float = 0, lot_size: int = 1) -> None:
+        self.fixed_fee = fixed_fee
+        self.fee_bps = fee_bps
+        self.slippage_bps = slippage_bps
+        self.lot_size = lot_size
+
+    def __str__(self) -> str:
+        return f"fee={self.fixed_fee}+{self.fee_bps}bps slippage={self.slippage_bps}bps lot={self.lot_size}"
+
+    @classmethod
+    def from_config(cls, costs: dict) -> "CostModel":
+        """Creates a cost model from a config entry with keys FIXED_FEE, FEE_BPS, SLIPPAGE_BPS and LOT_SIZE."""
+        return cls(costs.get("FIXED_FEE", 0),
+                   costs.get("FEE_BPS", 0),
+                   costs.get("SLIPPAGE_BPS", 0),
+                   costs.get("LOT_SIZE", 1))
     
 class Backtesting:
     """Class for performing backtesting on trading strategies.
@@ -12,43 +54,82 @@ class Backtesting:
     ----------
     fund : float
         The initial amount of capital available for trading (default is $10,000).
+    pattern : str
+        The strftime pattern used to display signal dates (default is the 'PATTERN' of 
+        ./config/config.yaml, read on first use, or '%Y-%m-%d' if there is no config file).
 
     Methods
     -------
-    test(df: pd.DataFrame) -> float:
-        Simulates the trading strategy based on the provided DataFrame and returns the final fund amount.
-    test_strategy(strategy_func: Callable, df: pd.DataFrame, windows: List[Tuple[int, int]], verbose: int) -> Dict[str, object]:
+    test(df: pd.DataFrame or SignalEvents, costs: CostModel) -> float:
+        Simulates the trading strategy based on the provided DataFrame or events and returns the final fund amount.
+    test_strategy(strategy_func: Callable, df: pd.DataFrame, windows: List[Tuple[int, int]], verbose: int, sparse: bool, ticker: str, checkpoint_dir: str, interval: str) -> Dict[str, object]:
         Tests multiple trading strategy parameters and returns the best-performing one.
-    show_signals(df: pd.DataFrame, latest: bool, is_oscillator: bool) -> List[Tuple[str, str]] or Tuple[str, str, str]:
-        Displays trading signals based on the provided DataFrame.
+    resume(strategy_func: Callable, df: pd.DataFrame, params: Tuple[int, ...], ticker: str, checkpoint_dir: str, interval: str) -> float:
+        Backtests a strategy incrementally from the checkpoint of a previous run on the same ticker.
+    test_costs(trades: List[Tuple[np.ndarray, np.ndarray]], costs: List[CostModel]) -> np.ndarray:
+        Simulates the round trips of several strategy runs under several cost models in one batched pass.
+    sweep(strategy_func: Callable, df: pd.DataFrame, windows: List[Tuple[int, int]], costs: List[CostModel]) -> pd.DataFrame:
+        Tests every window under every cost model and returns the grid of final fund amounts.
+    test_intervals(strategy_func: Callable, frames: Dict[str, pd.DataFrame], windows: List[Tuple[int, int]]) -> pd.DataFrame:
+        Tests a strategy on several intervals of the same ticker and returns one result row per interval.
+    show_signals(df: pd.DataFrame or SignalEvents, latest: bool, is_oscillator: bool) -> List[Tuple[str, str]] or Tuple[str, str, str]:
+        Displays trading signals based on the provided DataFrame or events.
     """
     
-    def __init__(self, fund: float = 10_000) -> None:
+    def __init__(self, fund: float = 10_000, pattern: str = None) -> None:
         """Initializes the Backtesting object with the given fund amount.
 
         Parameters
         ----------
         fund : float
             The initial amount of capital available for trading (default is 10,000).
+        pattern : str
+            The strftime pattern used to display signal dates (default is None, which reads 
+            'PATTERN' from ./config/config.yaml when a date is first displayed).
         """
         self.fund = fund
+        self._pattern = pattern
+    
+    @property
+    def pattern(self) -> str:
+        if self._pattern is None:
+            try:
+                self._pattern = load_config().get('PATTERN', DEFAULT_PATTERN)
+            except FileNotFoundError:
+                self._pattern = DEFAULT_PATTERN
+        return self._pattern
                 
-    def test(self, df: pd.DataFrame = None) -> float:
+    @instrument.timed("backtesting.test")
+    def test(self, df: pd.DataFrame or SignalEvents = None, costs: CostModel = None) -> float:
         """Simulates the trading strategy based on the provided DataFrame.
 
         The method assumes a simple buy/sell strategy based on signals provided in the DataFrame.
+        When given SignalEvents, only the event bars are visited.
 
         Parameters
         ----------
-        df : pd.DataFrame
+        df : pd.DataFrame or SignalEvents
             A DataFrame containing stock data with columns 'adjclose' and 'signal'. 
             The 'signal' column should have values of 1 (buy) and -1 (sell).
+            Alternatively, the sparse buy/sell events returned by a strategy with `sparse=True`.
+        costs : CostModel
+            The fees, slippage and lot size applied to each fill (default is None, frictionless 
+            fills of whole shares).
 
         Returns
         -------
         float
             The final fund amount after executing the buy/sell signals.
         """
+        if costs is not None:
+            events = df if isinstance(df, SignalEvents) else SignalEvents.from_signal(df)
+            return float(self.test_costs([events.trades()], [costs])[0, 0])
+        
+        if isinstance(df, SignalEvents):
+            instrument.count("backtesting.events_processed", len(df))
+            return self._test_events(df)
+        
+        instrument.count("backtesting.rows_processed", len(df))
         n_stocks = 0
         curr_fund = self.fund
         stock_in_hand = False
@@ -68,8 +149,206 @@ class Backtesting:
             curr_fund += n_stocks * price
         
         return round(curr_fund, 2)
+    
+    def _test_events(self, events: SignalEvents) -> float:
+        """Simulates the trading strategy over sparse buy/sell events."""
+        n_stocks, curr_fund, stock_in_hand = self._run_events(events.price, events.direction, 0, self.fund, False)
+        
+        if stock_in_hand:
+            curr_fund += n_stocks * events.last_price
+        
+        return round(curr_fund, 2)
+    
+    @staticmethod
+    def _run_events(prices: np.ndarray, directions: np.ndarray, n_stocks: float, curr_fund: float, stock_in_hand: bool) -> Tuple[float, float, bool]:
+        """Applies buy/sell events to a (shares, cash, position) state and returns the new state."""
+        for price, signal in zip(prices.tolist(), directions.tolist()):
+            if not stock_in_hand and signal == 1:
+                stock_in_hand = True
+                n_stocks = curr_fund // price
+                curr_fund -= n_stocks * price
+            elif stock_in_hand and signal == -1:
+                stock_in_hand = False
+                curr_fund += n_stocks * price
+                n_stocks = 0
+        
+        return n_stocks, curr_fund, stock_in_hand
+    
+    @staticmethod
+    def fingerprint(df: pd.DataFrame, n_bars: int) -> str:
+        """Returns a hash of the dates and prices of the first `n_bars` rows of `df`.
+
+        Every row is hashed, so a revision of any past bar (e.g. a dividend adjustment of
+        'adjclose' or a correction of a single bar) changes the fingerprint.
+        """
+        columns = [column for column in ['date', 'open', 'high', 'low', 'close', 'adjclose', 'volume'] if column in df.columns]
+        hashes = pd.util.hash_pandas_object(df[columns].iloc[:n_bars], index=False)
+        return hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()
+    
+    def resume(self, strategy_func: Callable, df: pd.DataFrame, params: Tuple[int, ...], ticker: str, checkpoint_dir: str, interval: str = '1d') -> float:
+        """Backtests a strategy incrementally from a checkpoint of a previous run.
+
+        The checkpoint of a (ticker, interval, first date, strategy, params) holds the shares, cash and position after
+        the last bar processed, the date of that bar, a fingerprint of the data up to it and the
+        tail the strategy needs to continue its indicators (see the `incremental` method of the
+        crossover strategies). If the first bars of `df` still match the fingerprint, the
+        indicators and crossovers are only computed on the new bars, seeded with the tail, and
+        only their events are simulated; otherwise (e.g. when historical prices were revised) the
+        checkpoint is discarded and the backtest restarts from the first bar. The checkpoint is
+        then updated to the last bar of `df`.
+
+        Parameters
+        ----------
+        strategy_func : Callable
+            A bound crossover strategy method (e.g. `SimpleMovingAverage().sma`) whose class has an `incremental` method.
+        df : pd.DataFrame
+            A DataFrame containing stock data, extending the data of the previous run.
+        params : Tuple[int, ...]
+            The strategy parameters (e.g., (short_window, long_window)).
+        ticker : str
+            The ticker symbol of `df`, used to name the checkpoint.
+        checkpoint_dir : str
+            The directory of the checkpoint files.
+        interval : str
+            The frequency of `df`, used to name the checkpoint (default is '1d').
+
+        Returns
+        -------
+        float
+            The final fund amount, equal to that of `test` on the whole of `df`.
+        """
+        params = tuple(params)
+        incremental = strategy_func.__self__.incremental
+        
+        # Name the checkpoint after every strategy parameter, including the defaulted ones (e.g. MACD's signal_lag)
+        arguments = inspect.signature(incremental).bind(df, 0, *params)
+        arguments.apply_defaults()
+        all_params = [value for key, value in arguments.arguments.items() if key not in ("df", "start", "tail")]
+        first_date = pd.Timestamp(df['date'].iloc[0]).strftime("%Y%m%d%H%M") if len(df) else None
+        name = "_".join([ticker, interval, str(first_date), strategy_func.__name__] + [str(param) for param in all_params])
+        path = os.path.join(checkpoint_dir, f"{name}.json")
+        
+        state = {"n_bars": 0, "n_stocks": 0, "fund": self.fund, "stock_in_hand": False, "tail": None}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                checkpoint = json.load(f)
+            n_bars = checkpoint.get("n_bars", 0)
+            if (checkpoint.get("start_fund") == self.fund and checkpoint.get("tail") is not None and 0 < n_bars <= len(df)
+                    and str(df['date'].iloc[n_bars - 1]) == checkpoint.get("last_date")
+                    and self.fingerprint(df, n_bars) == checkpoint.get("fingerprint")):
+                state = checkpoint
+                instrument.count("backtesting.checkpoint_hits")
+            else:
+                instrument.count("backtesting.checkpoint_invalidations")
+        
+        events, tail = incremental(df, state["n_bars"], *params, tail=state["tail"])
+        instrument.count("backtesting.events_processed", len(events))
+        n_stocks, curr_fund, stock_in_hand = self._run_events(events.price, events.direction,
+                                                              state["n_stocks"], state["fund"], state["stock_in_hand"])
+        
+        if len(df):
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump({
+                    "ticker": ticker,
+                    "strategy": strategy_func.__name__,
+                    "params": params,
+                    "start_fund": self.fund,
+                    "n_bars": len(df),
+                    "last_date": str(df['date'].iloc[-1]),
+                    "fingerprint": self.fingerprint(df, len(df)),
+                    "n_stocks": float(n_stocks),
+                    "fund": float(curr_fund),
+                    "stock_in_hand": bool(stock_in_hand),
+                    "tail": tail,
+                }, f, indent=2)
+        
+        if stock_in_hand:
+            curr_fund += n_stocks * df['adjclose'].iloc[-1]
+        
+        return round(curr_fund, 2)
    
-    def test_strategy(self, strategy_func: Callable, df: pd.DataFrame, windows: List[Tuple[int, int]] = [(3, 5), (5, 10)], verbose: int = 1) -> Dict[str, object]:
+    def test_costs(self, trades: List[Tuple[np.ndarray, np.ndarray]], costs: List[CostModel]) -> np.ndarray:
+        """Simulates the round trips of several strategy runs under several cost models.
+
+        The round trips of all runs are padded into (runs x trades) arrays and the cash of every 
+        (run, cost model) pair is updated together, one round trip at a time, so a whole grid of 
+        parameters and cost assumptions is evaluated in a single pass over the trades.
+
+        Parameters
+        ----------
+        trades : List[Tuple[np.ndarray, np.ndarray]]
+            The entry and exit prices of each run, as returned by `SignalEvents.trades`.
+        costs : List[CostModel]
+            The cost models to apply.
+
+        Returns
+        -------
+        np.ndarray
+            The final fund amounts as a (runs x cost models) array.
+        """
+        n_trades = max((len(entries) for entries, _ in trades), default=0)
+        entries = np.full((len(trades), n_trades), np.nan)
+        exits = np.full((len(trades), n_trades), np.nan)
+        for i, (run_entries, run_exits) in enumerate(trades):
+            entries[i, :len(run_entries)] = run_entries
+            exits[i, :len(run_exits)] = run_exits
+        instrument.count("backtesting.trades_processed", int(np.isfinite(entries).sum()) * len(costs))
+
+        # Cost parameters broadcast along the second axis
+        fixed_fee = np.array([cost.fixed_fee for cost in costs], dtype=float)
+        fee_rate = np.array([cost.fee_bps for cost in costs], dtype=float) / 10_000
+        slippage = np.array([cost.slippage_bps for cost in costs], dtype=float) / 10_000
+        lot_size = np.array([cost.lot_size for cost in costs], dtype=float)
+        
+        curr_fund = np.full((len(trades), len(costs)), float(self.fund))
+        for t in range(n_trades):
+            active = ~np.isnan(entries[:, t:t + 1])
+            entry, exit = entries[:, t:t + 1], exits[:, t:t + 1]
+            
+            # Buy as many whole lots as the cash allows after fees
+            buy_price = entry * (1 + slippage) * (1 + fee_rate)
+            n_stocks = np.floor_divide(np.maximum(curr_fund - fixed_fee, 0), buy_price)
+            n_stocks = np.floor_divide(n_stocks, lot_size) * lot_size
+            n_stocks = np.where(active, n_stocks, 0)
+            traded = n_stocks > 0
+            
+            curr_fund = curr_fund - np.where(traded, n_stocks * buy_price + fixed_fee, 0)
+            curr_fund = curr_fund + np.where(traded, n_stocks * (exit * (1 - slippage) * (1 - fee_rate)) - fixed_fee, 0)
+        
+        return np.round(curr_fund, 2)
+    
+    def sweep(self, strategy_func: Callable, df: pd.DataFrame, windows: List[Tuple[int, int]], costs: List[CostModel]) -> pd.DataFrame:
+        """Tests every window under every cost model.
+
+        The strategy is run once per window with `sparse=True`, and all (window, cost model) 
+        pairs are then simulated together by `test_costs`.
+
+        Parameters
+        ----------
+        strategy_func : Callable
+            A crossover strategy function that accepts the window parameters and `sparse=True`.
+        df : pd.DataFrame
+            A DataFrame containing stock data needed for strategy execution.
+        windows : List[Tuple[int, int]]
+            A list of (short_window, long_window) combinations to test.
+        costs : List[CostModel]
+            The cost models to apply.
+
+        Returns
+        -------
+        pd.DataFrame
+            The final fund amounts, indexed by window with one column per cost model.
+        """
+        windows = [tuple(window) for window in windows]
+        trades = [strategy_func(df, short_window, long_window, sparse=True).trades() for short_window, long_window in windows]
+        
+        return pd.DataFrame(self.test_costs(trades, costs),
+                            index=pd.Index(windows, tupleize_cols=False, name="window"),
+                            columns=[str(cost) for cost in costs])
+    
+    def test_strategy(self, strategy_func: Callable, df: pd.DataFrame, windows: List[Tuple[int, int]] = [(3, 5), (5, 10)], verbose: int = 1, sparse: bool = False,
+                      ticker: str = None, checkpoint_dir: str = None, interval: str = '1d') -> Dict[str, object]:
         """Tests multiple trading strategy parameters and returns the best-performing one.
 
         The method evaluates different short and long window parameters for the strategy 
@@ -85,12 +364,21 @@ class Backtesting:
             A list of tuples representing different (short_window, long_window) combinations to test (default is [(3, 5), (5, 10)]).
         verbose : int
             If set to 1, the method will print details of each test (default is 1).
+        sparse : bool
+            If True, the strategy is run with `sparse=True` and backtested over its events only (default is False).
+        ticker : str
+            The ticker symbol of `df`, required with `checkpoint_dir` (default is None).
+        checkpoint_dir : str
+            If given, each window is backtested with `resume` from its checkpoint in this directory
+            and no DataFrame or SignalEvents is kept (default is None).
+        interval : str
+            The frequency of `df`, used with `checkpoint_dir` to name the checkpoints (default is '1d').
 
         Returns
         -------
         Dict[str, object]
             A dictionary containing the best window parameters, the final fund amount, 
-            and the DataFrame resulting from the best strategy.
+            and the DataFrame (or SignalEvents if `sparse` is True) resulting from the best strategy.
         """
         
         best_window = None
@@ -99,8 +387,12 @@ class Backtesting:
         
         for window in windows:
             short_window, long_window = window
-            tmp_df = strategy_func(df, short_window, long_window)
-            final_fund = self.test(tmp_df)
+            if checkpoint_dir:
+                tmp_df = None
+                final_fund = self.resume(strategy_func, df, window, ticker, checkpoint_dir, interval)
+            else:
+                tmp_df = strategy_func(df, short_window, long_window, sparse=True) if sparse else strategy_func(df, short_window, long_window)
+                final_fund = self.test(tmp_df)
             
             if verbose:
                 print(f"Short ({short_window} Days), Long ({long_window} Days)\nFinal Fund: ${final_fund}", end='\n\n')
@@ -121,7 +413,41 @@ class Backtesting:
             "best_df": best_df
         }
     
-    def show_signals(self, df: pd.DataFrame, latest: bool = False, is_oscillator: bool = False) -> List[Tuple[str, str]] or Tuple[str, str, str]:
+    def test_intervals(self, strategy_func: Callable, frames: Dict[str, pd.DataFrame], windows: List[Tuple[int, int]] = [(3, 5), (5, 10)]) -> pd.DataFrame:
+        """Tests a strategy on several intervals of the same ticker.
+
+        Each interval is run through `test_strategy` over its sparse events, typically on the
+        frames returned by `TickerData.get_intervals`.
+
+        Parameters
+        ----------
+        strategy_func : Callable
+            A crossover strategy function that accepts the window parameters and `sparse=True`.
+        frames : Dict[str, pd.DataFrame]
+            The ticker data of each interval, keyed by interval.
+        windows : List[Tuple[int, int]]
+            A list of (short_window, long_window) combinations to test (default is [(3, 5), (5, 10)]).
+
+        Returns
+        -------
+        pd.DataFrame
+            A DataFrame indexed by interval with the number of bars, the best window, 
+            its final fund amount and the latest signal.
+        """
+        rows = []
+        for interval, df in frames.items():
+            result = self.test_strategy(strategy_func, df, windows, verbose=0, sparse=True)
+            rows.append({
+                "interval": interval,
+                "bars": len(df),
+                "best": result.get("best"),
+                "fund": result.get("fund"),
+                "signal": self.show_signals(result.get("best_df"), latest=True),
+            })
+        return pd.DataFrame(rows).set_index("interval")
+    
+    @instrument.timed("backtesting.show_signals")
+    def show_signals(self, df: pd.DataFrame or SignalEvents, latest: bool = False, is_oscillator: bool = False) -> List[Tuple[str, str]] or Tuple[str, str, str]:
         """Displays trading signals based on the provided DataFrame.
 
         Depending on the flags, the method can return either a list of signals or
@@ -129,9 +455,10 @@ class Backtesting:
 
         Parameters
         ----------
-        df : pd.DataFrame
+        df : pd.DataFrame or SignalEvents
             A DataFrame containing stock data with a 'signal' column for buy/sell signals 
-            and optional 'overbought'/'oversold' indicators for oscillator signals.
+            and optional 'overbought'/'oversold' indicators for oscillator signals, 
+            or the sparse buy/sell events of a crossover strategy.
         latest : bool
             If True, returns only the most recent signal (default is False).
         is_oscillator : bool
@@ -145,6 +472,12 @@ class Backtesting:
             [(signal, date), ...] or the most recent signal as a tuple (signal, start_date, end_date) 
             if `latest` is True. If `is_oscillator` is True, returns a list of oscillator signals.
         """
+        if isinstance(df, SignalEvents):
+            if latest and len(df):
+                date = pd.Timestamp(df.date[-1]).strftime(self.pattern)
+                return f"Buy Signal on {date}" if df.direction[-1] == 1 else f"Sell Signal on {date}"
+            return list(zip(df.direction.tolist(), map(pd.Timestamp, df.date)))
+        
         if not is_oscillator:
             lst_signal_date = []
             for _, row in df[(df.signal == -1) | (df.signal == 1)].sort_values(by='date').iterrows():
@@ -152,7 +485,7 @@ class Backtesting:
                 lst_signal_date.append((signal, date))
                                 
             if latest and lst_signal_date:
-                date = date.strftime(config['PATTERN']) 
+                date = date.strftime(self.pattern) 
                 return f"Buy Signal on {date}" if lst_signal_date[-1][0] == 1 else f"Sell Signal on {date}"
             else:
                 return lst_signal_date
@@ -173,7 +506,7 @@ class Backtesting:
             while i < len(tmp_lst_signals):
                 signal = tmp_lst_signals[i]
                 current_flag = signal[0]
-                start_date = signal[1].strftime(config['PATTERN']) 
+                start_date = signal[1].strftime(self.pattern) 
                 
                 # Look ahead for the next signal with a different flag
                 i += 1
@@ -182,7 +515,7 @@ class Backtesting:
                 
                 # If there is a valid next signal with a different flag
                 if i < len(tmp_lst_signals):
-                    end_date = tmp_lst_signals[i][1].strftime(config['PATTERN']) 
+                    end_date = tmp_lst_signals[i][1].strftime(self.pattern) 
                     lst_signals.append((current_flag, start_date, end_date))
                 
             if latest:
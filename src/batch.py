@@ -0,0 +1,207 @@
+"""This is a python script for the batch job runner."""
+import sys
+import pandas as pd
+from typing import Dict, List, Tuple
+from src.backtesting import Backtesting
+from src.config import load_config
+from src.data import INTERVALS, INTRADAY_HISTORY, TickerData, can_resample
+from src.strategy import SimpleMovingAverage, ExponentialMovingAverage, MovingAverageConvergenceDivergence
+
+STRATEGIES = {
+    "sma": SimpleMovingAverage().sma,
+    "ema": ExponentialMovingAverage().ema,
+    "macd": MovingAverageConvergenceDivergence().macd,
+}
+
+class BatchJob:
+    """A single backtest job in a batch.
+
+    Attributes
+    ----------
+    ticker : str
+        The stock ticker symbol (e.g., 'AAPL').
+    start_date : str
+        The start date of the job in 'YYYY-MM-DD' format (None for no lower bound).
+    end_date : str
+        The end date of the job in 'YYYY-MM-DD' format (None for no upper bound).
+    interval : str
+        The frequency of the data (default is '1d').
+    strategies : List[str]
+        The names of the crossover strategies to run, keys of `STRATEGIES`.
+    windows : List[Tuple[int, int]]
+        The (short_window, long_window) combinations to test for each strategy.
+    """
+
+    def __init__(self, ticker: str, start_date: str = None, end_date: str = None, interval: str = '1d',
+                 strategies: List[str] = None, windows: List[Tuple[int, int]] = None) -> None:
+        self.ticker = ticker
+        self.start_date = start_date
+        self.end_date = end_date
+        self.interval = interval
+        self.strategies = strategies or list(STRATEGIES)
+        self.windows = [tuple(window) for window in (windows or [(3, 5), (5, 10)])]
+
+    @classmethod
+    def from_config(cls, job: dict) -> "BatchJob":
+        """Creates a job from a config entry using the same keys as `config.yaml`."""
+        return cls(job.get("TICKER"),
+                   job.get("START_DATE"),
+                   job.get("END_DATE"),
+                   job.get("INTERVAL", '1d'),
+                   job.get("STRATEGIES"),
+                   job.get("WINDOWS"))
+
+class BatchRunner:
+    """Class for planning and running many backtest jobs together.
+
+    Jobs on the same ticker share fetches. Daily-and-coarser jobs are served by one native
+    fetch over the union of their date ranges (at '1d' unless they all use the same interval),
+    so they keep Yahoo's split/dividend-adjusted 'adjclose'. Intraday jobs share a fetch at the
+    finest of their intervals only while the union of their date ranges stays within the history
+    Yahoo serves for that interval; coarser intervals are resampled locally from the shared
+    fetch. Each (strategy, window) is computed once on the
+    fetched frame and every job reads its own date slice from the shared result, so
+    indicators are warmed up with the bars preceding the job's start date.
+
+    Attributes
+    ----------
+    fund : float
+        The initial amount of capital available for each job (default is 10,000).
+
+    Methods
+    -------
+    plan(jobs: List[BatchJob]) -> Dict[Tuple[str, str, str, str], List[BatchJob]]:
+        Groups the jobs into fetches of (ticker, start_date, end_date, interval).
+    run(jobs: List[BatchJob]) -> pd.DataFrame:
+        Runs all jobs and returns one row per (job, strategy).
+    """
+
+    def __init__(self, fund: float = 10_000, pattern: str = None, cache_dir: str = None) -> None:
+        self.fund = fund
+        self.cache_dir = cache_dir
+        self.backtesting = Backtesting(fund, pattern)
+
+    @staticmethod
+    def _union(range_a: Tuple[str, str], range_b: Tuple[str, str]) -> Tuple[str, str]:
+        """Returns the union of two date ranges, where a missing start or end date leaves that side open."""
+        start_date = None if range_a[0] is None or range_b[0] is None else min(range_a[0], range_b[0])
+        end_date = None if range_a[1] is None or range_b[1] is None else max(range_a[1], range_b[1])
+        return start_date, end_date
+
+    @staticmethod
+    def _fits(date_range: Tuple[str, str], interval: str) -> bool:
+        """Returns True if Yahoo serves `interval` bars over the whole date range."""
+        if date_range[0] is None:
+            return False
+        end_date = pd.Timestamp.today() if date_range[1] is None else pd.Timestamp(date_range[1])
+        return end_date - pd.Timestamp(date_range[0]) <= INTRADAY_HISTORY[interval]
+
+    def plan(self, jobs: List[BatchJob]) -> Dict[Tuple[str, str, str, str], List[BatchJob]]:
+        """Groups the jobs into as few fetches as Yahoo can serve.
+
+        Parameters
+        ----------
+        jobs : List[BatchJob]
+            The jobs to plan.
+
+        Returns
+        -------
+        Dict[Tuple[str, str, str, str], List[BatchJob]]
+            The jobs served by each fetch, keyed by (ticker, start_date, end_date, interval).
+        """
+        groups = []
+        for job in sorted(jobs, key=lambda job: INTERVALS[job.interval]):
+            job_range = (job.start_date, job.end_date)
+            daily = INTERVALS[job.interval] >= INTERVALS['1d']
+
+            for group in groups:
+                if group["ticker"] != job.ticker or group["daily"] != daily:
+                    continue
+                merged_range = self._union(group["range"], job_range)
+                if daily:
+                    group["interval"] = group["interval"] if group["interval"] == job.interval else '1d'
+                elif not can_resample(group["interval"], job.interval) or not (
+                        merged_range == group["range"] or self._fits(merged_range, group["interval"])):
+                    continue
+                group["range"] = merged_range
+                group["jobs"].append(job)
+                break
+            else:
+                groups.append({"ticker": job.ticker, "daily": daily, "interval": job.interval, "range": job_range, "jobs": [job]})
+
+        return {(group["ticker"], *group["range"], group["interval"]): group["jobs"] for group in groups}
+
+    @staticmethod
+    def _slice(df: pd.DataFrame, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+        """Returns the rows of `df` with `start_date <= date < end_date`."""
+        mask = pd.Series(True, index=df.index)
+        if start_date is not None:
+            mask &= df['date'] >= pd.Timestamp(start_date)
+        if end_date is not None:
+            mask &= df['date'] < pd.Timestamp(end_date)
+        return df[mask]
+
+    def run(self, jobs: List[BatchJob]) -> pd.DataFrame:
+        """Runs all jobs, sharing fetched data and computed strategies between them.
+
+        Parameters
+        ----------
+        jobs : List[BatchJob]
+            The jobs to run.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per (job, strategy) with the best window, its final fund and the
+            latest signal within the job's date range.
+        """
+        frames = {}
+        for fetch_key, group_jobs in self.plan(jobs).items():
+            obj_ticker_data = TickerData(*fetch_key, self.cache_dir)
+            intervals = obj_ticker_data.get_intervals(sorted({job.interval for job in group_jobs}, key=INTERVALS.get))
+            for job in group_jobs:
+                frames[id(job)] = (fetch_key, intervals[job.interval])
+        computed = {}
+        rows = []
+
+        for job in jobs:
+            fetch_key, df = frames[id(job)]
+            for name in job.strategies:
+                strategy_func = STRATEGIES[name]
+                best_window, best_fund, best_df = None, None, None
+
+                for window in job.windows:
+                    key = (fetch_key, job.interval, name, window)
+                    if key not in computed:
+                        computed[key] = strategy_func(df.copy(), *window)
+                    tmp_df = self._slice(computed[key], job.start_date, job.end_date)
+                    final_fund = self.backtesting.test(tmp_df)
+
+                    if best_fund is None or final_fund > best_fund:
+                        best_window, best_fund, best_df = window, final_fund, tmp_df
+
+                rows.append({
+                    "ticker": job.ticker,
+                    "start_date": job.start_date,
+                    "end_date": job.end_date,
+                    "interval": job.interval,
+                    "strategy": name,
+                    "best": best_window,
+                    "fund": best_fund,
+                    "signal": self.backtesting.show_signals(best_df, latest=True),
+                })
+
+        return pd.DataFrame(rows)
+
+def run_batch(config_path: str, output_path: str, cache_dir: str = None) -> pd.DataFrame:
+    """Runs the jobs listed under `JOBS` in a YAML file and writes all results to one CSV."""
+    batch_config = load_config(config_path)
+    jobs = [BatchJob.from_config(job) for job in batch_config.get("JOBS", [])]
+    results = BatchRunner(batch_config.get("FUND", 10_000), batch_config.get("PATTERN"), cache_dir).run(jobs)
+    results.to_csv(output_path, index=False)
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python3 -m src.batch <jobs.yaml> <output.csv>")
+    print(run_batch(sys.argv[1], sys.argv[2]))
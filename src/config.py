@@ -0,0 +1,32 @@
+"""This is a python script for loading the YAML config."""
+import os
+from typing import Dict
+
+DEFAULT_CONFIG_PATH = "./config/config.yaml"
+
+_configs: Dict[str, dict] = {}
+
+def load_config(path: str = None) -> dict:
+    """Loads a YAML config file, reading each path at most once.
+
+    yaml is only imported once a config file has been opened, so modules can depend on the
+    config without paying for it at import time, and a missing file raises FileNotFoundError
+    without importing it at all.
+
+    Parameters
+    ----------
+    path : str
+        The path of the config file (default is './config/config.yaml').
+
+    Returns
+    -------
+    dict
+        The parsed config.
+    """
+    path = os.path.abspath(path or DEFAULT_CONFIG_PATH)
+    if path not in _configs:
+        with open(path, 'r') as f:
+            import yaml
+
+            _configs[path] = yaml.load(f, Loader=yaml.FullLoader) or {}
+    return _configs[path]
@@ -1,6 +1,92 @@
 """This is a python script for the data class."""
+import os
 import pandas as pd
-from yahoo_fin.stock_info import get_data
+from typing import Dict, List
+from src.instrument import instrument
+
+# Bar length of each supported interval, used to order intervals from finest to coarsest
+INTERVALS = {
+    '1m': pd.Timedelta(minutes=1),
+    '2m': pd.Timedelta(minutes=2),
+    '5m': pd.Timedelta(minutes=5),
+    '15m': pd.Timedelta(minutes=15),
+    '30m': pd.Timedelta(minutes=30),
+    '60m': pd.Timedelta(minutes=60),
+    '90m': pd.Timedelta(minutes=90),
+    '1h': pd.Timedelta(hours=1),
+    '1d': pd.Timedelta(days=1),
+    '1wk': pd.Timedelta(weeks=1),
+    '1mo': pd.Timedelta(days=31),
+}
+
+# Calendar intervals whose bins are not a whole number of any shorter calendar interval
+CALENDAR_RULES = {
+    '1wk': 'W-MON',
+    '1mo': 'MS',
+}
+
+# Longest date range Yahoo Finance serves for each intraday interval
+INTRADAY_HISTORY = {
+    '1m': pd.Timedelta(days=7),
+    '2m': pd.Timedelta(days=60),
+    '5m': pd.Timedelta(days=60),
+    '15m': pd.Timedelta(days=60),
+    '30m': pd.Timedelta(days=60),
+    '60m': pd.Timedelta(days=730),
+    '90m': pd.Timedelta(days=60),
+    '1h': pd.Timedelta(days=730),
+}
+
+# How each OHLCV column is aggregated into a coarser bar
+AGGREGATIONS = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'adjclose': 'last',
+    'volume': 'sum',
+}
+
+def can_resample(source: str, target: str) -> bool:
+    """Returns True if bars of the `target` interval can be built from bars of the `source` interval."""
+    if target in CALENDAR_RULES:
+        return source == target or INTERVALS[source] <= INTERVALS['1d']
+    return INTERVALS[target] % INTERVALS[source] == pd.Timedelta(0)
+
+def resample(df: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """Aggregates OHLCV bars into coarser bars of the given interval.
+
+    Each bar is labelled with the start of its period: open is the first open, high the
+    highest high, low the lowest low, close and adjclose the last values and volume the sum.
+    Periods without any source bar are dropped. Intraday periods are anchored to the first bar
+    of each day (the session open) rather than to midnight, so that e.g. '1h' bars of a session
+    opening at 14:30 start at 14:30, 15:30, ... like the bars Yahoo Finance returns.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        A DataFrame with a 'date' column and OHLCV columns, as returned by `TickerData.get_data`.
+    interval : str
+        The target interval, a key of `INTERVALS` (e.g., '15m', '1h', '1d', '1wk').
+
+    Returns
+    -------
+    pd.DataFrame
+        A DataFrame with the same columns as `df`, one row per `interval` bar.
+    """
+    aggregations = {column: how for column, how in AGGREGATIONS.items() if column in df.columns}
+    
+    if interval not in CALENDAR_RULES and INTERVALS[interval] < INTERVALS['1d']:
+        # Label each bar with the start of its period, counted from the first bar of its day
+        step = INTERVALS[interval]
+        session_start = df['date'].groupby(df['date'].dt.normalize()).transform('min')
+        labels = (session_start + ((df['date'] - session_start) // step) * step).rename('date')
+        df_resampled = df.drop(columns='date').groupby(labels).agg(aggregations)
+    else:
+        rule = CALENDAR_RULES.get(interval, INTERVALS[interval])
+        df_resampled = df.set_index('date').resample(rule, label='left', closed='left').agg(aggregations)
+    df_resampled = df_resampled.dropna(subset=['close']).reset_index()
+    return df_resampled[[column for column in df.columns if column in df_resampled.columns]]
 
 class TickerData:
     """Class for retrieving historical stock data for a given ticker.
@@ -16,15 +102,19 @@ class TickerData:
     interval : str
         The frequency of the data retrieval (default is '1d'). 
         Options include '1d', '1wk', '1mo', etc.
+    cache_dir : str
+        The directory where fetched data is cached on disk (default is None, no caching).
 
     Methods
     -------
-    get_data():
+    get_data(cache_only: bool):
         Retrieves historical stock data for the specified ticker within the date range 
         and returns it as a pandas DataFrame.
+    get_intervals(intervals: List[str]) -> Dict[str, pd.DataFrame]:
+        Builds coarser interval bars locally from the fetched interval.
     """
     
-    def __init__(self, ticker: str = None, start_date: str = None, end_date: str = None, interval: str = '1d') -> None:
+    def __init__(self, ticker: str = None, start_date: str = None, end_date: str = None, interval: str = '1d', cache_dir: str = None) -> None:
         """Initializes the TickerData object with ticker symbol, date range, and interval.
 
         Parameters
@@ -38,17 +128,36 @@ class TickerData:
         interval : str
             The frequency of the data retrieval (default is '1d'). 
             Options include '1d', '1wk', '1mo', etc.
+        cache_dir : str
+            The directory where fetched data is cached on disk (default is None, no caching).
         """
         self.ticker = ticker
         self.start_date = start_date
         self.end_date = end_date
         self.interval = interval
+        self.cache_dir = cache_dir
+        self._frames = {}
     
-    def get_data(self) -> pd.DataFrame:
+    @property
+    def cache_path(self) -> str:
+        """The path of the cached data for this ticker, date range and interval, or None without `cache_dir`."""
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, f"{self.ticker}_{self.interval}_{self.start_date}_{self.end_date}.pkl")
+    
+    def get_data(self, cache_only: bool = False) -> pd.DataFrame:
         """Retrieves historical stock data for the specified ticker.
 
         Uses the Yahoo Finance API to fetch the stock data and processes it into a 
-        pandas DataFrame with a datetime index.
+        pandas DataFrame with a datetime index. If `cache_dir` is set, the fetched data 
+        is written to the cache, replacing any previous copy.
+
+        Parameters
+        ----------
+        cache_only : bool
+            If True, the data is read from the cache instead of being fetched, and a 
+            FileNotFoundError is raised when it has not been cached (default is False). 
+            The cache is never read otherwise, since it may be stale for open-ended ranges.
 
         Returns
         -------
@@ -57,12 +166,71 @@ class TickerData:
             low, close, volume, and adjusted close prices. The 'date' column is 
             converted to datetime format.
         """
-        df = get_data(self.ticker, 
-                      start_date=self.start_date, 
-                      end_date=self.end_date, 
-                      index_as_date=False, 
-                      interval=self.interval)
-
-        df['date'] = pd.to_datetime(df['date'])
-        df.drop(columns='ticker', inplace=True)
+        cache_path = self.cache_path
+        if cache_only:
+            if cache_path is None or not os.path.exists(cache_path):
+                raise FileNotFoundError(f"No cached data for {self.ticker} ({self.interval}) at {cache_path}")
+            instrument.count("data.disk_cache_hits")
+            with instrument.span("data.read_cache", ticker=self.ticker, interval=self.interval):
+                df = pd.read_pickle(cache_path)
+            self._frames = {self.interval: df}
+            return df
+        
+        # yahoo_fin pulls in requests_html, pyppeteer and lxml, so it is only imported when fetching
+        from yahoo_fin.stock_info import get_data
+        
+        with instrument.span("data.get_data", ticker=self.ticker, interval=self.interval):
+            df = get_data(self.ticker, 
+                          start_date=self.start_date, 
+                          end_date=self.end_date, 
+                          index_as_date=False, 
+                          interval=self.interval)
+
+            df['date'] = pd.to_datetime(df['date'])
+            df.drop(columns='ticker', inplace=True)
+        
+        if instrument.enabled:
+            instrument.count("data.rows_fetched", len(df))
+            instrument.count("data.bytes_fetched", int(df.memory_usage(deep=True).sum()))
+        
+        if cache_path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            df.to_pickle(cache_path)
+        
+        self._frames = {self.interval: df}
         return df
+    
+    def get_intervals(self, intervals: List[str]) -> Dict[str, pd.DataFrame]:
+        """Builds bars for several intervals from a single fetch of `self.interval`.
+
+        The data is fetched once (if `get_data` has not been called yet), and every coarser
+        interval is resampled from the coarsest already-built interval it can be derived from,
+        so that e.g. '1h' bars are built from '15m' bars rather than from the fetched '5m' bars.
+        Built intervals are cached on the object.
+
+        Parameters
+        ----------
+        intervals : List[str]
+            The intervals to build, each at least as coarse as `self.interval`.
+
+        Returns
+        -------
+        Dict[str, pd.DataFrame]
+            The bars of each requested interval, keyed by interval.
+        """
+        if self.interval not in self._frames:
+            self.get_data()
+        
+        for interval in sorted(intervals, key=INTERVALS.get):
+            if interval in self._frames:
+                instrument.count("data.interval_cache_hits")
+                continue
+            instrument.count("data.interval_cache_misses")
+            sources = [source for source in self._frames if can_resample(source, interval)]
+            if not sources:
+                raise ValueError(f"Cannot build {interval} bars from {self.interval} bars")
+            source = max(sources, key=INTERVALS.get)
+            with instrument.span("data.resample", source=source, interval=interval):
+                self._frames[interval] = resample(self._frames[source], interval)
+        
+        return {interval: self._frames[interval] for interval in intervals}
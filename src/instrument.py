@@ -0,0 +1,209 @@
+"""This is a python script for the instrumentation of the data, strategy and backtesting stages."""
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Callable, Dict, List
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+def peak_rss() -> int:
+    """Returns the peak resident set size of the process in bytes, or None if unavailable."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return max_rss if os.uname().sysname == 'Darwin' else max_rss * 1024
+
+class _Span:
+    """Context manager that records the wall time of one stage."""
+
+    def __init__(self, owner: "Instrumentation", name: str, args: dict) -> None:
+        self.owner = owner
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        end = time.perf_counter()
+        self.owner.spans.append((self.name, self.start, end, threading.get_ident(), self.args))
+
+class Instrumentation:
+    """Class for timing and counting the hot paths of a run.
+
+    When disabled, `span` returns a shared no-op context manager, `count` returns immediately
+    and functions wrapped with `timed` are called directly, so the hooks left in the code cost
+    a single attribute check. Setting the `INSTRUMENT` environment variable to a path prefix
+    enables it at import and writes `<prefix>.json` and `<prefix>.trace.json` at exit.
+
+    Attributes
+    ----------
+    enabled : bool
+        Whether spans and counters are recorded.
+    spans : List[tuple]
+        The recorded spans as (name, start, end, thread id, args), with times from `time.perf_counter`.
+    counters : Dict[str, float]
+        The accumulated counters (e.g., rows processed, bytes fetched, cache hits).
+
+    Methods
+    -------
+    span(name: str, **args) -> ContextManager:
+        Times the enclosed block under `name`.
+    count(name: str, value: float):
+        Adds `value` to the counter `name`.
+    timed(name: str) -> Callable:
+        Decorator that times every call of the wrapped function under `name`.
+    summary() -> Dict[str, object]:
+        Aggregates the spans per name along with the counters and peak RSS.
+    export_json(path: str):
+        Writes the summary to a JSON file.
+    export_trace(path: str):
+        Writes the spans and counters to a Chrome trace-event file (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.reset()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        """Clears all recorded spans and counters."""
+        self.origin = time.perf_counter()
+        self.spans: List[tuple] = []
+        self.counters: Dict[str, float] = {}
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def timed(self, name: str) -> Callable:
+        def decorator(func: Callable) -> Callable:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, name, {}):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self) -> Dict[str, object]:
+        """Aggregates the recorded spans per name.
+
+        Returns
+        -------
+        Dict[str, object]
+            A dictionary with the call count, total and maximum wall time (in seconds) of each
+            span name, the counters and the peak RSS in bytes.
+        """
+        stages = {}
+        for name, start, end, _, _ in self.spans:
+            stage = stages.setdefault(name, {"calls": 0, "total_s": 0.0, "max_s": 0.0})
+            stage["calls"] += 1
+            stage["total_s"] += end - start
+            stage["max_s"] = max(stage["max_s"], end - start)
+
+        return {
+            "stages": stages,
+            "counters": dict(self.counters),
+            "peak_rss_bytes": peak_rss(),
+        }
+
+    def export_json(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def export_trace(self, path: str) -> None:
+        """Writes complete ('X') events for the spans and one counter ('C') event per counter."""
+        pid = os.getpid()
+        events = [{
+            "name": name,
+            "cat": name.split('.')[0],
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": pid,
+            "tid": tid,
+            "args": {key: str(value) for key, value in args.items()},
+        } for name, start, end, tid, args in self.spans]
+
+        end_ts = (time.perf_counter() - self.origin) * 1e6
+        events += [{"name": name, "ph": "C", "ts": end_ts, "pid": pid, "args": {name: value}}
+                   for name, value in self.counters.items()]
+
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+_NULL_SPAN = nullcontext()
+
+instrument = Instrumentation(enabled=bool(os.environ.get("INSTRUMENT")))
+
+def _export_at_exit(prefix: str) -> None:
+    instrument.export_json(f"{prefix}.json")
+    instrument.export_trace(f"{prefix}.trace.json")
+
+if os.environ.get("INSTRUMENT"):
+    atexit.register(_export_at_exit, os.environ["INSTRUMENT"])
+
+@contextmanager
+def capture(profile_path: str = None, trace_memory: bool = False, top: int = 20):
+    """Captures a cProfile and/or tracemalloc profile of the enclosed block.
+
+    Parameters
+    ----------
+    profile_path : str
+        If given, the block is run under cProfile and the stats are written to this path
+        (readable with `pstats` or snakeviz); the top functions by cumulative time are printed.
+    trace_memory : bool
+        If True, the block is run under tracemalloc and the top allocation sites are printed (default is False).
+    top : int
+        The number of functions or allocation sites to print (default is 20).
+    """
+    profiler = None
+    if profile_path:
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+    if trace_memory:
+        import tracemalloc
+
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"tracemalloc peak: {peak / 1024 ** 2:.1f} MiB")
+            for stat in snapshot.statistics("lineno")[:top]:
+                print(stat)
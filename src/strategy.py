@@ -1,6 +1,138 @@
 """This is a python script for the strategy classes."""
 
+import numpy as np
 import pandas as pd
+from typing import Callable, List, Tuple
+from src.instrument import instrument
+
+class SignalEvents:
+    """Sparse representation of crossover buy/sell signals.
+
+    Instead of a dense 'signal' column that is 0 on almost every bar, only the bars with a
+    signal are stored, as arrays sorted by bar position.
+
+    Attributes
+    ----------
+    index : np.ndarray
+        The positions of the signal bars in the source DataFrame.
+    direction : np.ndarray
+        The signal at each event, 1 (buy) or -1 (sell).
+    date : np.ndarray
+        The date of each event.
+    price : np.ndarray
+        The 'adjclose' price at each event.
+    last_price : float
+        The 'adjclose' price of the final bar, used to close any open position.
+    n_bars : int
+        The number of bars in the source DataFrame.
+    """
+
+    def __init__(self, index: np.ndarray, direction: np.ndarray, date: np.ndarray, price: np.ndarray,
+                 last_price: float, n_bars: int) -> None:
+        self.index = index
+        self.direction = direction
+        self.date = date
+        self.price = price
+        self.last_price = last_price
+        self.n_bars = n_bars
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @classmethod
+    def from_signal(cls, df: pd.DataFrame) -> "SignalEvents":
+        """Builds the events from a DataFrame with a dense 'signal' column."""
+        signal = df['signal'].to_numpy()
+        prices = df['adjclose'].to_numpy(dtype=float)
+        index = np.flatnonzero((signal == 1) | (signal == -1))
+
+        return cls(index,
+                   signal[index].astype(np.int8),
+                   df['date'].to_numpy()[index],
+                   prices[index],
+                   prices[-1] if len(prices) else np.nan,
+                   len(prices))
+
+    def trades(self) -> tuple:
+        """Returns the entry and exit prices of the round trips taken by a long-only strategy.
+
+        A buy is only taken when flat and a sell only when holding, so leading sells and repeated
+        signals in the same direction are dropped. A position still open after the last event
+        exits at `last_price`.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            The entry prices and exit prices, one per round trip.
+        """
+        direction = self.direction
+        buys = np.flatnonzero(direction == 1)
+        if not len(buys):
+            return np.empty(0), np.empty(0)
+
+        direction, price = direction[buys[0]:], self.price[buys[0]:]
+        taken = np.r_[True, direction[1:] != direction[:-1]]
+        price = price[taken]
+
+        entries, exits = price[0::2], price[1::2]
+        if len(exits) < len(entries):
+            exits = np.r_[exits, self.last_price]
+        return entries, exits
+
+    @classmethod
+    def from_crossover(cls, df: pd.DataFrame, fast: pd.Series, slow: pd.Series, prev: Tuple[float, float] = (np.nan, np.nan), offset: int = 0) -> "SignalEvents":
+        """Builds the events where `fast` crosses `slow`.
+
+        Uses the same rules as the dense 'signal' column: a buy when `fast` moves above `slow`
+        and a sell when it moves below, with comparisons against NaN being False.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The ticker data with 'date' and 'adjclose' columns.
+        fast : pd.Series
+            The faster line (e.g., the short-lag moving average).
+        slow : pd.Series
+            The slower line (e.g., the long-lag moving average).
+        prev : Tuple[float, float]
+            The (fast, slow) values of the bar before the first row of `df`, when `df` continues
+            earlier data (default is (NaN, NaN), no earlier bar).
+        offset : int
+            The position of the first row of `df` in the full data, added to the event indices (default is 0).
+
+        Returns
+        -------
+        SignalEvents
+            The buy/sell events sorted by bar position.
+        """
+        fast, slow = fast.to_numpy(dtype=float), slow.to_numpy(dtype=float)
+        prev_fast, prev_slow = np.roll(fast, 1), np.roll(slow, 1)
+        prev_fast[:1], prev_slow[:1] = prev
+
+        with np.errstate(invalid='ignore'):
+            buy = (fast > slow) & (prev_fast <= prev_slow)
+            sell = (fast < slow) & (prev_fast >= prev_slow)
+
+        index = np.flatnonzero(buy | sell)
+        direction = np.where(buy[index], 1, -1).astype(np.int8)
+        prices = df['adjclose'].to_numpy(dtype=float)
+
+        return cls(index + offset,
+                   direction,
+                   df['date'].to_numpy()[index],
+                   prices[index],
+                   prices[-1] if len(prices) else np.nan,
+                   len(prices) + offset)
+
+def _seeded_ewm(values: pd.Series, span: int, seed: float = None) -> pd.Series:
+    """EMA (adjust=False) of `values`, continuing from the EMA value `seed` of the previous bar if given."""
+    if seed is None:
+        return values.ewm(span=span, adjust=False).mean()
+    seeded = pd.concat([pd.Series([seed], dtype=float), values.reset_index(drop=True)], ignore_index=True)
+    return seeded.ewm(span=span, adjust=False).mean().iloc[1:]
+
+def _last(values: pd.Series, default: float) -> float:
+    return float(values.iloc[-1]) if len(values) else default
 
 class SimpleMovingAverage:
     """Simple Moving Average (SMA) Crossover Strategy.
@@ -22,7 +154,8 @@ class SimpleMovingAverage:
     def __str__(self) -> str:
         return "SMA Strategy"
     
-    def sma(self, df: pd.DataFrame = None, short_lag: int = 3, long_lag: int = 5) -> pd.DataFrame:
+    @instrument.timed("strategy.sma")
+    def sma(self, df: pd.DataFrame = None, short_lag: int = 3, long_lag: int = 5, sparse: bool = False) -> pd.DataFrame or SignalEvents:
         """SMA Crossover Strategy implementation.
         
         1. Create the short-lag and long-lag SMAs using pandas' .rolling() and .mean().
@@ -39,12 +172,19 @@ class SimpleMovingAverage:
         long_lag: int
             This defines the look-back period for the long-lag SMA (default is 200).
             
+        sparse: bool
+            If True, returns only the buy/sell events as a SignalEvents object (default is False).
+            
         Returns
         -------
-        pd.DataFrame
+        pd.DataFrame or SignalEvents
             A DataFrame that contains the original price data along with the short-lag SMA, long-lag SMA, and buy/sell signals.
+            If `sparse` is True, the buy/sell events instead.
         """
         
+        if sparse:
+            return SignalEvents.from_crossover(df, df['adjclose'].rolling(window=short_lag).mean(), df['adjclose'].rolling(window=long_lag).mean())
+        
         # Create window
         df['sma_short'] = df['adjclose'].rolling(window=short_lag).mean()
         df['sma_long'] = df['adjclose'].rolling(window=long_lag).mean()
@@ -64,6 +204,42 @@ class SimpleMovingAverage:
         
         return df_sma
     
+    def incremental(self, df: pd.DataFrame, start: int = 0, short_lag: int = 3, long_lag: int = 5, tail: dict = None) -> Tuple[SignalEvents, dict]:
+        """SMA crossover events on the bars of `df` from position `start` onwards.
+
+        The SMAs only need the closes of the preceding `long_lag - 1` bars, which together with
+        the SMA values of the previous bar are kept in `tail`, so the bars before `start` are never read.
+
+        Parameters
+        ----------
+        df: pd.DataFrame
+            This defines the ticker data in a pandas DataFrame.
+        start: int
+            The position of the first bar to compute (default is 0).
+        short_lag: int
+            This defines the look-back period for the short-lag SMA.
+        long_lag: int
+            This defines the look-back period for the long-lag SMA.
+        tail: dict
+            The tail returned by the call that computed the bars up to `start` (None when `start` is 0).
+
+        Returns
+        -------
+        Tuple[SignalEvents, dict]
+            The buy/sell events of the new bars and the tail to continue from the last bar.
+        """
+        tail = tail or {"closes": [], "fast": np.nan, "slow": np.nan}
+        closes = pd.concat([pd.Series(tail["closes"], dtype=float), df['adjclose'].iloc[start:].reset_index(drop=True)], ignore_index=True)
+        
+        fast = closes.rolling(window=short_lag).mean().iloc[len(tail["closes"]):]
+        slow = closes.rolling(window=long_lag).mean().iloc[len(tail["closes"]):]
+        n_closes = max(short_lag, long_lag) - 1
+        
+        return (SignalEvents.from_crossover(df.iloc[start:], fast, slow, (tail["fast"], tail["slow"]), start),
+                {"closes": closes.iloc[-n_closes:].tolist() if n_closes else [],
+                 "fast": _last(fast, tail["fast"]),
+                 "slow": _last(slow, tail["slow"])})
+    
 class ExponentialMovingAverage:
     """Exponential Moving Average (EMA) Crossover Strategy.
     
@@ -86,7 +262,8 @@ class ExponentialMovingAverage:
     def __str__(self) -> str:
         return "EMA Strategy"
 
-    def ema(self, df: pd.DataFrame = None, short_lag: int = 5, long_lag: int = 10) -> pd.DataFrame:
+    @instrument.timed("strategy.ema")
+    def ema(self, df: pd.DataFrame = None, short_lag: int = 5, long_lag: int = 10, sparse: bool = False) -> pd.DataFrame or SignalEvents:
         """EMA Crossover Strategy implementation.
         
         1. Create the short-lag and long-lag EMAs using pandas' .ewm() and .mean().
@@ -103,12 +280,19 @@ class ExponentialMovingAverage:
         long_lag: int
             This defines the look-back period for the long-lag EMA.
             
+        sparse: bool
+            If True, returns only the buy/sell events as a SignalEvents object (default is False).
+            
         Returns
         -------
-        pd.DataFrame
+        pd.DataFrame or SignalEvents
             This DataFrame contains the ticker data with EMAs and signals.
+            If `sparse` is True, the buy/sell events instead.
         """
         
+        if sparse:
+            return SignalEvents.from_crossover(df, df['adjclose'].ewm(span=short_lag, adjust=False).mean(), df['adjclose'].ewm(span=long_lag, adjust=False).mean())
+        
         # Create window
         df['ema_short'] = df['adjclose'].ewm(span=short_lag, adjust=False).mean()
         df['ema_long'] = df['adjclose'].ewm(span=long_lag, adjust=False).mean()
@@ -128,6 +312,40 @@ class ExponentialMovingAverage:
 
         return df_ema
     
+    def incremental(self, df: pd.DataFrame, start: int = 0, short_lag: int = 5, long_lag: int = 10, tail: dict = None) -> Tuple[SignalEvents, dict]:
+        """EMA crossover events on the bars of `df` from position `start` onwards.
+
+        With adjust=False each EMA only depends on its value at the previous bar, which is kept
+        in `tail`, so the bars before `start` are never read.
+
+        Parameters
+        ----------
+        df: pd.DataFrame
+            This defines the ticker data in a pandas DataFrame.
+        start: int
+            The position of the first bar to compute (default is 0).
+        short_lag: int
+            This defines the look-back period for the short-lag EMA.
+        long_lag: int
+            This defines the look-back period for the long-lag EMA.
+        tail: dict
+            The tail returned by the call that computed the bars up to `start` (None when `start` is 0).
+
+        Returns
+        -------
+        Tuple[SignalEvents, dict]
+            The buy/sell events of the new bars and the tail to continue from the last bar.
+        """
+        tail = tail or {"fast": None, "slow": None}
+        closes = df['adjclose'].iloc[start:]
+        
+        fast = _seeded_ewm(closes, short_lag, tail["fast"])
+        slow = _seeded_ewm(closes, long_lag, tail["slow"])
+        prev = (np.nan, np.nan) if tail["fast"] is None else (tail["fast"], tail["slow"])
+        
+        return (SignalEvents.from_crossover(df.iloc[start:], fast, slow, prev, start),
+                {"fast": _last(fast, tail["fast"]), "slow": _last(slow, tail["slow"])})
+    
 class BollingerBands:
     """Bollinger Bands Strategy.
     
@@ -146,6 +364,7 @@ class BollingerBands:
     def __init__(self) -> None:
         ...
         
+    @instrument.timed("strategy.bollinger_bands")
     def bollinger_bands(self, df: pd.DataFrame = None, coefficient: int = 2) -> pd.DataFrame:
         """Create Bollinger Bands.
         
@@ -201,7 +420,8 @@ class MovingAverageConvergenceDivergence:
     def __init__(self, ) -> None:
         ...
         
-    def macd(self, df: pd.DataFrame, short_lag: int = 12, long_lag: int = 26, signal_lag: int = 9) -> pd.DataFrame:
+    @instrument.timed("strategy.macd")
+    def macd(self, df: pd.DataFrame, short_lag: int = 12, long_lag: int = 26, signal_lag: int = 9, sparse: bool = False) -> pd.DataFrame or SignalEvents:
         """MACD Crossover Strategy.
         
         1. Calculate short-term and long-term EMAs.
@@ -222,12 +442,20 @@ class MovingAverageConvergenceDivergence:
         signal_lag: int
             The period for calculating the Signal line (typically 9 days).
         
+        sparse: bool
+            If True, returns only the buy/sell events as a SignalEvents object (default is False).
+        
         Returns
         -------
-        pd.DataFrame
+        pd.DataFrame or SignalEvents
             The DataFrame with MACD line, Signal line, histogram, and signals.
+            If `sparse` is True, the buy/sell events instead.
         """
         
+        if sparse:
+            macd = df['adjclose'].ewm(span=short_lag, adjust=False).mean() - df['adjclose'].ewm(span=long_lag, adjust=False).mean()
+            return SignalEvents.from_crossover(df, macd, macd.ewm(span=signal_lag, adjust=False).mean())
+        
         # Calculate short-term and long-term EMAs
         df[f'{short_lag}-day ema'] = df['adjclose'].ewm(span=short_lag, adjust=False).mean()
         df[f'{long_lag}-day ema'] = df['adjclose'].ewm(span=long_lag, adjust=False).mean()
@@ -254,6 +482,48 @@ class MovingAverageConvergenceDivergence:
         df.loc[(df['macd'] < 0) & (df['macd'].shift(1) >= 0), 'conditions'] = 'bear' 
         
         return df
+    
+    def incremental(self, df: pd.DataFrame, start: int = 0, short_lag: int = 12, long_lag: int = 26, signal_lag: int = 9, tail: dict = None) -> Tuple[SignalEvents, dict]:
+        """MACD crossover events on the bars of `df` from position `start` onwards.
+
+        The short-term and long-term EMAs and the Signal line (adjust=False) only depend on their
+        values at the previous bar, which are kept in `tail` along with the previous MACD value,
+        so the bars before `start` are never read.
+
+        Parameters
+        ----------
+        df: pd.DataFrame
+            The DataFrame containing ticker price data.
+        start: int
+            The position of the first bar to compute (default is 0).
+        short_lag: int
+            The short-term EMA period (typically 12 days).
+        long_lag: int
+            The long-term EMA period (typically 26 days).
+        signal_lag: int
+            The period for calculating the Signal line (typically 9 days).
+        tail: dict
+            The tail returned by the call that computed the bars up to `start` (None when `start` is 0).
+
+        Returns
+        -------
+        Tuple[SignalEvents, dict]
+            The buy/sell events of the new bars and the tail to continue from the last bar.
+        """
+        tail = tail or {"ema_short": None, "ema_long": None, "fast": None, "slow": None}
+        closes = df['adjclose'].iloc[start:]
+        
+        ema_short = _seeded_ewm(closes, short_lag, tail["ema_short"])
+        ema_long = _seeded_ewm(closes, long_lag, tail["ema_long"])
+        macd = ema_short - ema_long
+        signal_line = _seeded_ewm(macd, signal_lag, tail["slow"])
+        prev = (np.nan, np.nan) if tail["fast"] is None else (tail["fast"], tail["slow"])
+        
+        return (SignalEvents.from_crossover(df.iloc[start:], macd, signal_line, prev, start),
+                {"ema_short": _last(ema_short, tail["ema_short"]),
+                 "ema_long": _last(ema_long, tail["ema_long"]),
+                 "fast": _last(macd, tail["fast"]),
+                 "slow": _last(signal_line, tail["slow"])})
 
 class RelativeStrengthIndex:
     """Relative Strength Index (RSI) Oscillator Strategy.
@@ -275,6 +545,7 @@ class RelativeStrengthIndex:
     def __str__(self) -> str:
         return "RSI Oscillator"
     
+    @instrument.timed("strategy.rsi")
     def rsi(self, df: pd.DataFrame, look_back_period: int = 14, upper_band: int = 70, lower_band: int = 30) -> pd.DataFrame:
         """RSI Oscillator Calculation.
         
@@ -351,6 +622,7 @@ class MoneyFlowIndex:
     def __str__(self) -> str:
         return "MFI Oscillator"
     
+    @instrument.timed("strategy.msi")
     def msi(self, df: pd.DataFrame, look_back_period: int = 14, upper_band: int = 80, lower_band: int = 20) -> pd.DataFrame:
         """Calculate the Money Flow Index (MFI) Calculation.
 
@@ -413,6 +685,56 @@ class MoneyFlowIndex:
         
         return df
     
+class RangeMinMax:
+    """Sparse table of range minima and maxima over a series.
+
+    Level k of the table holds the min and max of every run of 2**k consecutive values, so the
+    min or max of any window is the min or max of two overlapping runs. The table is built once
+    in O(n log w) and then answers a trailing window of any length up to `max_window` for every
+    bar with two array lookups. NaNs propagate like in pandas' `.rolling().min()/.max()`.
+
+    Attributes
+    ----------
+    mins : List[np.ndarray]
+        The minima of the runs of length 2**k at each level k.
+    maxs : List[np.ndarray]
+        The maxima of the runs of length 2**k at each level k.
+    max_window : int
+        The longest window the table can answer.
+    """
+
+    def __init__(self, values: np.ndarray, max_window: int = None) -> None:
+        values = np.asarray(values, dtype=float)
+        self.max_window = len(values) if max_window is None else max_window
+        self.mins, self.maxs = [values], [values]
+
+        span = 1
+        while 2 * span <= min(self.max_window, len(values)):
+            self.mins.append(np.minimum(self.mins[-1][:-span], self.mins[-1][span:]))
+            self.maxs.append(np.maximum(self.maxs[-1][:-span], self.maxs[-1][span:]))
+            span *= 2
+
+    def _query(self, levels: List[np.ndarray], reduce: Callable, window: int) -> np.ndarray:
+        if not 1 <= window <= self.max_window:
+            raise ValueError(f"window must be between 1 and {self.max_window}, got {window}")
+        if window > len(levels[0]):
+            return np.full(len(levels[0]), np.nan)
+        level = window.bit_length() - 1
+        runs = levels[level]
+
+        # Window ending at bar i covers runs starting at i - window + 1 and i - 2**level + 1
+        result = np.full(len(levels[0]), np.nan)
+        result[window - 1:] = reduce(runs[:len(runs) - window + (1 << level)], runs[window - (1 << level):])
+        return result
+
+    def rolling_min(self, window: int) -> np.ndarray:
+        """Returns the min of the trailing `window` values at every bar (NaN for the first `window - 1` bars)."""
+        return self._query(self.mins, np.minimum, window)
+
+    def rolling_max(self, window: int) -> np.ndarray:
+        """Returns the max of the trailing `window` values at every bar (NaN for the first `window - 1` bars)."""
+        return self._query(self.maxs, np.maximum, window)
+
 class StochasticOscillator:
     """Stochastic Oscillator Strategy.
     
@@ -430,13 +752,24 @@ class StochasticOscillator:
     def __str__(self) -> str:
         return "Stochastic Oscillator"
     
-    def so(self, df: pd.DataFrame = None) -> pd.DataFrame:
+    @instrument.timed("strategy.so")
+    def so(self, df: pd.DataFrame = None, window: int = 14, smooth_d: int = 3, upper_band: int = 80, lower_band: int = 20, table: RangeMinMax = None) -> pd.DataFrame:
         """Calculate the Stochastic Oscillator Calculation.
 
         Parameters
         ----------
         df : pd.DataFrame
             DataFrame containing at least the following column: 'close'.
+        window : int, optional
+            The look-back period of the high and low (default is 14).
+        smooth_d : int, optional
+            The period of the moving average of %K that gives %D (default is 3).
+        upper_band : int, optional
+            The threshold for determining an overbought condition (default is 80).
+        lower_band : int, optional
+            The threshold for determining an oversold condition (default is 20).
+        table : RangeMinMax, optional
+            A range min/max table built on `df['close']`, used instead of a rolling pass (default is None).
 
         Returns
         -------
@@ -449,25 +782,56 @@ class StochasticOscillator:
         The formula used for the calculation is:
 
             %K = [(C - L14) / (H14 - L14)] * 100
+            %D = 3-period SMA of %K
         
         where %K is the current value of the Stochastic Oscillator, L14 is the min(closing of past 14D), H14 is the max(closing of past 14D) and
-        C is the most recent closing price.
+        C is the most recent closing price. The 14 and 3 periods are set by `window` and `smooth_d`.
         """       
         
-        # Determine L14
-        df['L14'] = df['close'].rolling(window=14).min()
-        
-        # Determine H14
-        df['H14'] = df['close'].rolling(window=14).max()
+        # Determine L14 and H14
+        if table is not None:
+            df[f'L{window}'] = table.rolling_min(window)
+            df[f'H{window}'] = table.rolling_max(window)
+        else:
+            df[f'L{window}'] = df['close'].rolling(window=window).min()
+            df[f'H{window}'] = df['close'].rolling(window=window).max()
         
-        # Determine %K
-        df['stoch_k'] = 100 * ((df['close'] - df['L14']) / (df['H14'] - df['L14']))
+        # Determine %K and %D
+        df['stoch_k'] = 100 * ((df['close'] - df[f'L{window}']) / (df[f'H{window}'] - df[f'L{window}']))
+        df['stoch_d'] = df['stoch_k'].rolling(window=smooth_d).mean()
         
         # Add signals for overbought or oversold
-        df['overbought'] = df['stoch_k'] > 80
-        df['oversold'] = df['stoch_k'] < 20
+        df['overbought'] = df['stoch_k'] > upper_band
+        df['oversold'] = df['stoch_k'] < lower_band
         
         return df
+    
+    @instrument.timed("strategy.so_sweep")
+    def so_sweep(self, df: pd.DataFrame, windows: List[int]) -> pd.DataFrame:
+        """Calculate %K for several look-back periods from a single range min/max table.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            DataFrame containing at least the following columns: 'date' and 'close'.
+        windows : List[int]
+            The look-back periods to calculate.
+
+        Returns
+        -------
+        pd.DataFrame
+            A DataFrame with the 'date' column and one %K column per window, named 'stoch_k_<window>'.
+        """
+        close = df['close'].to_numpy(dtype=float)
+        table = RangeMinMax(close, max(windows))
+        
+        df_sweep = pd.DataFrame({'date': df['date']})
+        for window in windows:
+            low, high = table.rolling_min(window), table.rolling_max(window)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                df_sweep[f'stoch_k_{window}'] = 100 * ((close - low) / (high - low))
+        
+        return df_sweep
         
 class RateOfChange:
     """Rate of Change (ROC) Indicator.
@@ -489,6 +853,7 @@ class RateOfChange:
     def __str__(self) -> str:
         return "Rate Of Change Indicator"
     
+    @instrument.timed("strategy.roc")
     def roc(self, df:pd.DataFrame, n: int = 9) -> pd.DataFrame:
         """ROC Calculation.
 
@@ -0,0 +1,171 @@
+"""This is a python script for the universe class."""
+import pandas as pd
+from typing import Dict, List
+from src.data import TickerData
+from src.instrument import instrument
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'adjclose']
+
+class Universe:
+    """Class for computing cross-sectional signals over many tickers at once.
+
+    Every OHLCV column of every ticker is aligned onto the union of their dates as a
+    (bars x tickers) DataFrame, so each indicator is computed for all tickers in a single
+    vectorized call instead of one pandas pipeline per ticker. A ticker without a bar on a
+    date holds NaN there, and the look-back periods count bars of the common date index.
+
+    Attributes
+    ----------
+    tickers : List[str]
+        The ticker symbols, in column order.
+    fields : Dict[str, pd.DataFrame]
+        The aligned (bars x tickers) matrix of each OHLCV column, keyed by column name.
+
+    Methods
+    -------
+    roc(n: int) -> pd.DataFrame:
+        Rate of Change of every ticker.
+    rsi(look_back_period: int) -> pd.DataFrame:
+        Relative Strength Index of every ticker.
+    crossover(short_lag: int, long_lag: int, ema: bool) -> pd.DataFrame:
+        SMA or EMA crossover buy/sell signals of every ticker.
+    rank(scores: pd.DataFrame, ascending: bool) -> pd.DataFrame:
+        Cross-sectional rank of every ticker on every bar.
+    top_k(scores: pd.DataFrame, k: int) -> pd.DataFrame:
+        Mask of the k highest-scoring tickers on every bar.
+    bottom_k(scores: pd.DataFrame, k: int) -> pd.DataFrame:
+        Mask of the k lowest-scoring tickers on every bar.
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], fill_limit: int = None) -> None:
+        """Aligns the ticker data onto a common date index.
+
+        Parameters
+        ----------
+        frames : Dict[str, pd.DataFrame]
+            The data of each ticker as returned by `TickerData.get_data`, keyed by ticker.
+        fill_limit : int
+            If given, missing prices are forward-filled for at most this many consecutive bars
+            and missing volumes are set to 0 on the filled bars (default is None, no filling).
+        """
+        self.tickers = list(frames)
+
+        with instrument.span("universe.align", tickers=len(self.tickers)):
+            columns = [column for column in PRICE_COLUMNS + ['volume'] if all(column in df.columns for df in frames.values())]
+            indexed = {ticker: df.set_index('date') for ticker, df in frames.items()}
+            self.fields = {column: pd.concat({ticker: df[column] for ticker, df in indexed.items()}, axis=1).sort_index()
+                           for column in columns}
+
+        if fill_limit is not None:
+            missing = self.fields['close'].isna() if 'close' in self.fields else None
+            for column in PRICE_COLUMNS:
+                if column in self.fields:
+                    self.fields[column] = self.fields[column].ffill(limit=fill_limit)
+            if 'volume' in self.fields and missing is not None:
+                filled = missing & self.fields['close'].notna()
+                self.fields['volume'] = self.fields['volume'].mask(filled, 0)
+
+        instrument.count("universe.cells", sum(field.size for field in self.fields.values()))
+
+    @classmethod
+    def from_tickers(cls, tickers: List[str], start_date: str = None, end_date: str = None, interval: str = '1d',
+                     cache_dir: str = None, cache_only: bool = False, fill_limit: int = None) -> "Universe":
+        """Retrieves the data of every ticker with `TickerData` and aligns it."""
+        frames = {ticker: TickerData(ticker, start_date, end_date, interval, cache_dir).get_data(cache_only=cache_only)
+                  for ticker in tickers}
+        return cls(frames, fill_limit)
+
+    @property
+    def dates(self) -> pd.Index:
+        return next(iter(self.fields.values())).index
+
+    def __getitem__(self, column: str) -> pd.DataFrame:
+        return self.fields[column]
+
+    @instrument.timed("universe.roc")
+    def roc(self, n: int = 9) -> pd.DataFrame:
+        """Rate of Change of the 'close' of every ticker, as in `RateOfChange.roc`.
+
+        Parameters
+        ----------
+        n : int
+            Defines the lookback period (default is 9).
+
+        Returns
+        -------
+        pd.DataFrame
+            The (bars x tickers) ROC.
+        """
+        close = self.fields['close']
+        return (close - close.shift(n)) / close.shift(n)
+
+    @instrument.timed("universe.rsi")
+    def rsi(self, look_back_period: int = 14) -> pd.DataFrame:
+        """Relative Strength Index of the 'adjclose' of every ticker, as in `RelativeStrengthIndex.rsi`.
+
+        Parameters
+        ----------
+        look_back_period : int
+            The look-back period for RSI calculation (default is 14).
+
+        Returns
+        -------
+        pd.DataFrame
+            The (bars x tickers) RSI.
+        """
+        delta = self.fields['adjclose'].diff()
+        gain = delta.clip(lower=0)
+        loss = -delta.clip(upper=0)
+
+        avg_gain = gain.rolling(window=look_back_period, min_periods=look_back_period).mean()
+        avg_loss = loss.rolling(window=look_back_period, min_periods=look_back_period).mean()
+        avg_gain = avg_gain.combine_first(gain.ewm(span=look_back_period, adjust=False).mean())
+        avg_loss = avg_loss.combine_first(loss.ewm(span=look_back_period, adjust=False).mean())
+
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+    @instrument.timed("universe.crossover")
+    def crossover(self, short_lag: int = 3, long_lag: int = 5, ema: bool = False) -> pd.DataFrame:
+        """Crossover signals of every ticker, as in `SimpleMovingAverage.sma` or `ExponentialMovingAverage.ema`.
+
+        Parameters
+        ----------
+        short_lag : int
+            The look-back period of the short-lag moving average (default is 3).
+        long_lag : int
+            The look-back period of the long-lag moving average (default is 5).
+        ema : bool
+            If True, exponential moving averages are used instead of simple ones (default is False).
+
+        Returns
+        -------
+        pd.DataFrame
+            The (bars x tickers) signals, where 1 = Buy, -1 = Sell and 0 = Hold.
+        """
+        adjclose = self.fields['adjclose']
+        if ema:
+            short = adjclose.ewm(span=short_lag, adjust=False).mean()
+            long = adjclose.ewm(span=long_lag, adjust=False).mean()
+        else:
+            short = adjclose.rolling(window=short_lag).mean()
+            long = adjclose.rolling(window=long_lag).mean()
+
+        buy = (short > long) & (short.shift(1) <= long.shift(1))
+        sell = (short < long) & (short.shift(1) >= long.shift(1))
+        return buy.astype(int) - sell.astype(int)
+
+    @staticmethod
+    def rank(scores: pd.DataFrame, ascending: bool = False) -> pd.DataFrame:
+        """Ranks the tickers on every bar, 1 being the highest score (or lowest if `ascending`).
+
+        Tickers with a NaN score on a bar are not ranked on that bar.
+        """
+        return scores.rank(axis=1, ascending=ascending, method='first', na_option='keep')
+
+    def top_k(self, scores: pd.DataFrame, k: int) -> pd.DataFrame:
+        """Returns a (bars x tickers) mask of the k highest-scoring tickers on every bar."""
+        return self.rank(scores) <= k
+
+    def bottom_k(self, scores: pd.DataFrame, k: int) -> pd.DataFrame:
+        """Returns a (bars x tickers) mask of the k lowest-scoring tickers on every bar."""
+        return self.rank(scores, ascending=True) <= k